@@ -4,13 +4,58 @@
 class NoMatchError(ValueError):
     """Indicates a failed parse."""
 
-    def __init__(self, *args, rule=None, unparsed=None):
+    # failed parses are raised and caught on every backtrack; slots keep each
+    # raise from allocating an instance dict
+    __slots__ = ('rule', 's', 'pos')
+
+    def __init__(self, *args, rule=None, s=None, pos=0, unparsed=None):
         """Initializer.
 
         :param args: arguments to pass through to super
         :param rule: rule that failed to match
-        :param unparsed: string that was being parsed
+        :param s: string that was being parsed
+        :param pos: position in ``s`` where the rule failed to match
+        :param unparsed: remainder of the string that was being parsed (instead of ``s`` and ``pos``)
         """
         super(NoMatchError, self).__init__(*args)
         self.rule = rule
-        self.unparsed = unparsed
+        if unparsed is not None:
+            s, pos = unparsed, 0
+        self.s = s
+        self.pos = pos
+
+    def __reduce__(self):
+        """Support pickling, which does not see slot attributes by default.
+
+        :returns: tuple
+        """
+        return (_restore, (type(self), self.args, self.rule, self.s, self.pos))
+
+    @property
+    def unparsed(self):
+        """Remainder of the string that failed to match.
+
+        :returns: str
+        """
+        if self.s is None:
+            return None
+        return self.s[self.pos:]
+
+
+class CutError(NoMatchError):
+    """Indicates a failed parse after a `Cut`, which is not backtracked from."""
+
+    __slots__ = ()
+
+
+def _restore(cls, args, rule, s, pos):
+    """Recreate a pickled `NoMatchError`.
+
+    :param cls: exception class
+    :param args: positional exception arguments
+    :param rule: rule that failed to match
+    :param s: string that was being parsed
+    :param pos: position in ``s`` where the rule failed to match
+    :returns: `NoMatchError`
+    """
+    return cls(*args, rule=rule, s=s, pos=pos)
@@ -1,13 +1,27 @@
+import inspect
 import re
+import sys
+import weakref
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+try:
+    from re._constants import MAXREPEAT
+except ImportError:  # Python < 3.11
+    from sre_constants import MAXREPEAT
 
 from .exceptions import *
-from .utils import Context
+from .utils import CharRange, Context
 
 
 __all__ = [
+    'CutError',
     'NoMatchError',
     'Alternatives',
     'Chars',
+    'Cut',
     'Literal',
     'LiteralCS',
     'Reference',
@@ -30,29 +44,141 @@ def ensure_rule(value):
     return value
 
 
+def _quantifier(min, max):
+    """Render a regular expression repetition quantifier.
+
+    `re` can't compile repetition counts of `MAXREPEAT` or more, an upper limit
+    that high is left open instead; no string is long enough to tell the difference.
+
+    :param min: minimum number of repetitions, below `MAXREPEAT`
+    :param max: maximum number of repetitions, or None for no limit
+    :returns: str
+    """
+    return '{{{min},{max}}}'.format(
+        min=min,
+        max='' if (max is None) or (max >= MAXREPEAT) else max,
+    )
+
+
 class Rule(object):
-    """Base class for all parser rules."""
+    """Base class for all parser rules.
+
+    Rules parse the input string in place: they are given the whole string and
+    the position to start matching at, and record the matched text as ``_match``
+    and the position right after it as ``_pos`` in the parse context.
+    """
+
+    __slots__ = ('__weakref__',)
+
+    # rules that only update the context once they have matched can be tried
+    # on the context itself, there's nothing to roll back if they fail; a stale
+    # ``_match`` and ``_pos`` are fine, whatever matches next overwrites them
+    _atomic = False
 
-    def parse(self, s, context):
+    # rules that never write anything but internal sunder keys into the context,
+    # not even when they match; a failed sequence of these leaves no captures behind
+    _pure = False
+
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
         # by default, do not match anything
-        raise NoMatchError(rule=self, unparsed=s)
+        raise NoMatchError(rule=self, s=s, pos=pos)
+
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return ()
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        return any(rule._may_cut() for rule in self.children())
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        return None
+
+    def fragment(self):
+        """Return a regular expression that matches exactly like this rule.
+
+        Only rules whose match is the matched input text, and which set nothing
+        else in the context, can be expressed as a fragment; a `Sequence` fuses
+        runs of such rules into a single regular expression.
+
+        :returns: str, or None if the rule cannot be expressed as a fragment
+        """
+        return None
+
+    def link(self):
+        """Resolve all references reachable from this rule ahead of parsing.
+
+        Each unresolved `Reference` has its function called once with an empty
+        context, and is bound to the result. Only call this on grammars whose
+        references do not depend on the parse context.
+
+        :returns: self
+        """
+        seen = set()
+        pending = [self]
+        while pending:
+            rule = pending.pop()
+            if id(rule) in seen:
+                continue
+            seen.add(id(rule))
+            if isinstance(rule, Reference) and rule.target is None:
+                rule.target = rule.fn() if rule._static else rule.fn(Context())
+            pending.extend(rule.children())
+        return self
+
+    @classmethod
+    def _flatten(cls, rules):
+        """Splice the rules of nested instances of the same combinator.
+
+        A `Sequence` nested in a `Sequence` (or `Alternatives` in `Alternatives`)
+        matches exactly like its rules spliced in its place, without the extra
+        level of dispatch. A combinator whose `Cut` would then commit to more
+        than it does nested is kept whole instead, see `_spliceable`.
+
+        :param rules: rules to combine
+        :returns: generator of `Rule`
+        """
+        for rule in map(ensure_rule, rules):
+            if (type(rule) is cls) and rule._spliceable():
+                yield from rule.rules
+            else:
+                yield rule
 
     def __call__(self, s, partial=False):
         """Parse a string and return its values.
 
-        :param s: string to parse
+        Byte strings are decoded as latin-1, which maps each byte to the character
+        with the same codepoint; matched values are returned as `str`.
+
+        :param s: string to parse (`str` or bytes-like)
         :param partial: boolean indicating whether to accept a partial match at start of ``s``
         """
         from .wrappers import FullMatch
-        context = Context()
-        context = FullMatch(self).parse(s, context)
+        if isinstance(s, (bytes, bytearray, memoryview)):
+            # ASCII-only text decodes into a compact 1-byte-per-character `str`,
+            # so the rules can keep operating on `str` at no extra memory cost
+            s = bytes(s).decode('latin-1')
+        # the memo table is shared by all `Memoize` rules for the duration of the parse
+        context = Context(_memo={})
+        context = FullMatch(self).parse(s, 0, context)
         return context.clean()
 
     def __getitem__(self, item):
@@ -176,44 +302,220 @@ class Rule(object):
 class WS(Rule):
     """Strip non-significant whitespace."""
 
+    __slots__ = ()
+
+    _atomic = True
+
+    _pure = True
+
+    # `\s` matches the same characters as `str.isspace()`
+    _regexp = re.compile(r'\s*')
+
     def __repr__(self):
         """Render representation."""
         return '[ <WS> ]'
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        unparsed = s.lstrip()
         context.update(
             _match='',
-            _unparsed=unparsed,
+            _pos=self._regexp.match(s, pos).end(),
         )
         return context
 
 
+class Cut(Rule):
+    """Commit to the current alternative.
+
+    Once a `Sequence` has matched up to a cut, a failure of any of its following
+    rules makes the enclosing `Alternatives` fail right away, without trying
+    the remaining alternatives, e.g. ``(L('if') + Cut() + condition) | name``.
+    Rules that just move on when a rule fails, like `Optional` and `Repeat`,
+    are not affected.
+
+    A cut covers the rest of the sequence it is in. Sequences built with ``+``
+    are extended in place, so ``a + Cut() + b + c`` covers both ``b`` and ``c``;
+    a sequence with a cut that is nested in another sequence, like
+    ``Seq(a, Seq(b, Cut()), c)`` or ``a + (b + Cut()) + c``, is not spliced
+    into it, and its cut doesn't cover ``c``. Likewise, a cut commits to the
+    `Alternatives` it is in: ``(a + Cut() + b | c) | d`` extends the alternatives
+    in place and commits to ``d`` as well, but ``Alt(Alt(a + Cut() + b, c), d)``
+    is not spliced, and only commits to ``c``.
+    """
+
+    __slots__ = ()
+
+    _atomic = True
+
+    _pure = True
+
+    def __repr__(self):
+        """Render representation."""
+        return '<Cut>'
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        return True
+
+    def parse(self, s, pos, context):
+        """Parse a string into the parse context.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        """
+        context.update(
+            _match='',
+            _pos=pos,
+        )
+        return context
+
+
+class _Committed(Rule):
+    """Rules following a `Cut` in a sequence.
+
+    Built by `Sequence`; failures are raised as `CutError`.
+    """
+
+    __slots__ = ('rule',)
+
+    def __init__(self, rule):
+        """Initializer.
+
+        :param rule: rule to commit to
+        """
+        super(_Committed, self).__init__()
+        self.rule = rule
+
+    def __repr__(self):
+        """Render representation."""
+        return repr(self.rule)
+
+    def parse(self, s, pos, context):
+        """Parse a string into the parse context.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        :raises: `CutError`
+        """
+        try:
+            return self.rule.parse(s, pos, context)
+        except CutError:
+            raise
+        except NoMatchError as e:
+            raise CutError(rule=e.rule, s=e.s, pos=e.pos)
+
+
 class Literal(Rule):
     """Rule matching one of a set of literal strings.
 
     Case-insensitive by default; pass casefold=False or use the
     LiteralCS alternate constructor for case-sensitive match.
+
+    Literal rules are immutable, so equal literals share a single instance.
     """
 
+    __slots__ = ('casefold', 'literals', '_regexp', '_words', '_literal', '_literal_len', '_max_len', '_forms')
+
+    _atomic = True
+
+    _pure = True
+
+    _instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, *literals, casefold=None):
+        """Return the shared instance for equal literals.
+
+        :param literals: literal strings to match
+        :param casefold: boolean indicating if matching should be case-folded
+        :returns: `Literal`
+        """
+        casefold = True if casefold is None else casefold
+        if casefold:
+            # literals that only differ in case match the same inputs
+            literals = tuple(literal.casefold() for literal in literals)
+        key = (cls, literals, casefold)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super(Literal, cls).__new__(cls)
+            cls._instances[key] = instance
+        return instance
+
+    def __getnewargs_ex__(self):
+        """Arguments to recreate the shared instance with when unpickling.
+
+        :returns: tuple of args and kwargs
+        """
+        return self.literals, dict(casefold=self.casefold)
+
+    def __copy__(self):
+        """Shared instances are immutable, a copy is the same instance.
+
+        :returns: self
+        """
+        return self
+
+    def __deepcopy__(self, memo):
+        """Shared instances are immutable, a copy is the same instance.
+
+        :returns: self
+        """
+        return self
+
     def __init__(self, *literals, casefold=None):
         """Initializer.
 
         :param literals: literal strings to match
         :param casefold: boolean indicating if matching should be case-folded
         """
+        if hasattr(self, 'literals'):
+            # shared instance, already initialized
+            return
         super(Literal, self).__init__()
         self.casefold = True if casefold is None else casefold
         if self.casefold:
-            literals = [literal.casefold() for literal in literals]
+            literals = tuple(literal.casefold() for literal in literals)
         self.literals = literals
         assert len(self.literals) > 0, 'Need at least one literal to match'
+        self._regexp = None
+        self._words = None
+        if len(set(map(len, self.literals))) == 1 and len(self.literals) > 1:
+            # keywords of the same length can only match one at a time,
+            # so a single set lookup decides between all of them
+            self._words = frozenset(self.literals)
+        elif len(self.literals) > 1:
+            # match a set of keywords in a single pass of the regex engine;
+            # alternation in `re` is ordered, so the first listed literal still wins
+            self._regexp = re.compile('|'.join(map(re.escape, self.literals)))
+        self._literal = self.literals[0]
+        self._literal_len = len(self._literal)
+        self._max_len = max(map(len, self.literals))
+        if len(self.literals) > 1:
+            self._forms = ()
+        elif self.casefold:
+            # common spellings of the literal that can be matched as they are,
+            # without casefolding the input; only keep those that fold back
+            # into the literal without changing its length
+            literal = self._literal
+            self._forms = tuple(
+                form for form in sorted({literal, literal.upper(), literal.title()})
+                if (len(form) == self._literal_len) and (form.casefold() == literal)
+            )
+        else:
+            # a case-sensitive literal only has the one spelling
+            self._forms = (self._literal,)
 
     def __repr__(self):
         """Render representation.
@@ -226,26 +528,83 @@ class Literal(Rule):
             literals=' | '.join(map(repr, self.literals)),
         )
 
-    def parse(self, s, context):
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        if not all(self.literals):
+            return None
+        return frozenset(literal[0].casefold()[0] for literal in self.literals)
+
+    def fragment(self):
+        """Return a regular expression that matches exactly like this rule.
+
+        Case-insensitive literals only qualify if they are made of ASCII characters
+        other than letters, which no other character casefolds into.
+
+        :returns: str, or None if the rule cannot be expressed as a fragment
+        """
+        if self.casefold and not all(
+            (c < '\x80') and not c.isalpha()
+            for literal in self.literals
+            for c in literal
+        ):
+            return None
+        if len(self.literals) == 1:
+            return re.escape(self._literal)
+        # an atomic group commits to the first matching literal, like `parse()` does
+        return '(?>{literals})'.format(
+            literals='|'.join(map(re.escape, self.literals)),
+        )
+
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
-        cs = s.casefold() if self.casefold else s
-        for literal in self.literals:
-            if not cs.startswith(literal):
-                continue
-            match_len = len(literal)
-            match = cs[:match_len]
-            context.update(
-                _match=match,
-                _unparsed=s[match_len:],
-            )
-            return context
-        raise NoMatchError(rule=self, unparsed=s)
+        if self._forms:
+            # single literals try their spellings first, with a single call
+            if s.startswith(self._forms, pos):
+                context.update(
+                    _match=self._literal,
+                    _pos=pos + self._literal_len,
+                )
+                return context
+            if not self.casefold:
+                raise NoMatchError(rule=self, s=s, pos=pos)
+        if self.casefold:
+            # only casefold as much of the input as the literals can match
+            cs = s[pos:pos + self._max_len].casefold()
+            cpos = 0
+        else:
+            cs = s
+            cpos = pos
+        if self._words is not None:
+            match = cs[cpos:cpos + self._max_len]
+            if match not in self._words:
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            match_len = self._max_len
+        elif self._regexp is None:
+            match = self._literal
+            if not cs.startswith(match, cpos):
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            match_len = self._literal_len
+        else:
+            m = self._regexp.match(cs, cpos)
+            if not m:
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            match = m.group(0)
+            match_len = len(match)
+        context.update(
+            _match=match,
+            _pos=pos + match_len,
+        )
+        return context
 
 
 def LiteralCS(*literals):
@@ -258,7 +617,16 @@ def LiteralCS(*literals):
 
 
 class RegExp(Rule):
-    """Rule matching a regular expression at start of input."""
+    """Rule matching a regular expression at the current position of the input.
+
+    The expression is matched against the whole input starting at the current
+    position, as with `re.Pattern.match(s, pos)`; note that ``^`` will only
+    match at the real beginning of the input.
+    """
+
+    __slots__ = ('regexp', '_pure')
+
+    _atomic = True
 
     def __init__(self, regexp, flags=None):
         """Initializer.
@@ -269,7 +637,11 @@ class RegExp(Rule):
         super(RegExp, self).__init__()
         if isinstance(regexp, str):
             regexp = re.compile(regexp, flags or 0)
+        # group names are fixed by the pattern, check them once instead of on every match
+        assert not any(key.startswith('_') for key in regexp.groupindex), 'Capture name cannot start with underscore'
         self.regexp = regexp
+        # named groups are captured into the context
+        self._pure = not regexp.groupindex
 
     def __repr__(self):
         """Render representation."""
@@ -277,32 +649,174 @@ class RegExp(Rule):
             rx=self.regexp.pattern.replace('\\', '\\\\').replace('/', '\\/'),
         )
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         Named groups will be captured as context keys.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
-        m = self.regexp.match(s)
+        m = self.regexp.match(s, pos)
         if not m:
-            raise NoMatchError(rule=self, unparsed=s)
-        groupdict = m.groupdict()
-        assert not any(key.startswith('_') for key in groupdict), 'Capture name cannot start with underscore'
-        match = m.group(0)
+            raise NoMatchError(rule=self, s=s, pos=pos)
         context.update(
-            _match=match,
-            _unparsed=s[len(match):],
-            **m.groupdict()
+            _match=m.group(0),
+            _pos=m.end(),
         )
+        if self.regexp.groupindex:
+            # only patterns with named groups have anything to capture
+            context.update(m.groupdict())
         return context
 
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        Only simple expressions are analyzed: literals, character sets without
+        categories or negation, groups, alternations and repetitions.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        if self.regexp.flags & re.IGNORECASE:
+            return None
+        try:
+            parsed = sre_parse.parse(self.regexp.pattern, self.regexp.flags)
+        except Exception:
+            return None
+        chars = _first_codepoints(list(parsed))
+        if chars is None or len(chars) > 1024:
+            return None
+        return frozenset(chr(c).casefold()[0] for c in chars)
+
+
+def _first_codepoints(items):
+    """Find the codepoints a parsed regular expression can start with.
+
+    :param items: parsed regular expression, as a list of ``(op, arg)`` items
+    :returns: set of codepoints, or None if unknown or the expression can match an empty string
+    """
+    if not items:
+        return None
+    op, arg = items[0]
+    if op is sre_parse.LITERAL:
+        return {arg}
+    if op is sre_parse.IN:
+        codepoints = set()
+        for item_op, item_arg in arg:
+            if item_op is sre_parse.LITERAL:
+                codepoints.add(item_arg)
+            elif item_op is sre_parse.RANGE and item_arg[1] - item_arg[0] < 1024:
+                codepoints.update(range(item_arg[0], item_arg[1] + 1))
+            else:
+                return None
+        return codepoints
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)):
+        if not arg[0]:
+            return None
+        return _first_codepoints(list(arg[2]))
+    if op is sre_parse.SUBPATTERN:
+        if arg[1] & re.IGNORECASE:
+            return None
+        return _first_codepoints(list(arg[3]))
+    if op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+        return _first_codepoints(list(arg))
+    if op is sre_parse.BRANCH:
+        codepoints = set()
+        for branch in arg[1]:
+            branch_codepoints = _first_codepoints(list(branch))
+            if branch_codepoints is None:
+                return None
+            codepoints |= branch_codepoints
+        return codepoints
+    return None
+
+
+def _char_class(chars, negate=False):
+    """Render a range of characters as a regular expression character class.
+
+    :param chars: `CharRange` of characters to include in the class
+    :param negate: render a class matching any character except `chars`
+    :returns: str
+    """
+    if not chars.intervals:
+        # the empty class is not valid syntax
+        return r'[\s\S]' if negate else r'[^\s\S]'
+    return '[{negate}{runs}]'.format(
+        negate='^' if negate else '',
+        runs=''.join(
+            re.escape(chr(start)) + ('-' + re.escape(chr(end)) if end != start else '')
+            for start, end in chars.intervals
+        ),
+    )
+
 
 class Chars(Rule):
-    """Rule matching a run of allowed characters."""
+    """Rule matching a run of allowed characters.
+
+    Chars rules are immutable, so equal rules share a single instance.
+    """
+
+    __slots__ = ('chars', 'exclude', 'min', 'max', '_allowed', '_class', '_regexp')
+
+    _atomic = True
+
+    _pure = True
+
+    _instances = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _key(cls, chars, exclude, min, max):
+        """Build the key of the shared instance.
+
+        :returns: tuple
+        """
+        return (
+            cls,
+            None if chars is None else CharRange(chars).intervals,
+            None if exclude is None else CharRange(exclude).intervals,
+            min,
+            max,
+        )
+
+    def __new__(cls, chars=None, exclude=None, min=1, max=1):
+        """Return the shared instance for equal rules.
+
+        :param chars: characters to match
+        :param exclude: characters to exclude from match
+        :param min: minimum number of matching characters
+        :param max: maximum number of matching characters
+        :returns: `Chars`
+        """
+        key = cls._key(cls, chars, exclude, min, max)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = super(Chars, cls).__new__(cls)
+            cls._instances[key] = instance
+        return instance
+
+    def __getnewargs_ex__(self):
+        """Arguments to recreate the shared instance with when unpickling.
+
+        :returns: tuple of args and kwargs
+        """
+        return (self.chars, self.exclude), dict(min=self.min, max=self.max)
+
+    def __copy__(self):
+        """Shared instances are immutable, a copy is the same instance.
+
+        :returns: self
+        """
+        return self
+
+    def __deepcopy__(self, memo):
+        """Shared instances are immutable, a copy is the same instance.
+
+        :returns: self
+        """
+        return self
 
     def __init__(self, chars=None, exclude=None, min=1, max=1):
         """Initializer.
@@ -312,17 +826,46 @@ class Chars(Rule):
         :param min: minimum number of matching characters
         :param max: maximum number of matching characters
         """
+        if hasattr(self, 'chars'):
+            # shared instance, already initialized
+            return
         super(Chars, self).__init__()
-        self.chars = None if chars is None else set(chars)
-        self.exclude = None if exclude is None else set(exclude)
+        # a `CharRange` is kept as is, huge ranges are never expanded into sets
+        self.chars = None if chars is None else chars if isinstance(chars, CharRange) else set(chars)
+        self.exclude = None if exclude is None else exclude if isinstance(exclude, CharRange) else set(exclude)
         self.min = min
         self.max = max
-        if self.exclude is None:
-            self._predicate = lambda c: c in self.chars
-        elif self.chars is None:
-            self._predicate = lambda c: c not in self.exclude
+        # compile the run of characters into a regular expression, so that the
+        # scan runs in the `re` engine instead of a Python loop
+        self._allowed = None
+        if self.chars is not None:
+            allowed = CharRange(self.chars)
+            if self.exclude is not None:
+                allowed -= CharRange(self.exclude)
+            self._class = _char_class(allowed)
+            if len(allowed) <= 1024:
+                # small classes also get a frozen lookup set, for single
+                # characters and first character dispatch
+                self._allowed = allowed.chars
+        elif self.exclude is not None:
+            self._class = _char_class(CharRange(self.exclude), negate=True)
         else:
-            self._predicate = lambda c: (c in self.chars) and (c not in self.exclude)
+            # matching any character doesn't need a scan
+            self._class = None
+        self._regexp = self._compile()
+
+    def _compile(self):
+        """Compile the character class with the repetition limits.
+
+        :returns: compiled regular expression, or None if there is nothing to scan
+        """
+        if (self._class is None) or ((self.max is not None) and (self.max < self.min)):
+            # an impossible repetition range would not compile
+            return None
+        if self.min >= MAXREPEAT:
+            # no string is long enough to match
+            return None
+        return re.compile(self._class + _quantifier(self.min, self.max))
 
     def __repr__(self):
         """Render representation.
@@ -342,32 +885,71 @@ class Chars(Rule):
             ) if self.exclude is not None else '',
         )
 
-    def parse(self, s, context):
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        if not self.min or self._allowed is None:
+            # only small character classes have a lookup set to fold
+            return None
+        return frozenset(c.casefold()[0] for c in self._allowed)
+
+    def fragment(self):
+        """Return a regular expression that matches exactly like this rule.
+
+        :returns: str, or None if the rule cannot be expressed as a fragment
+        """
+        if ((self.max is not None) and (self.max < self.min)) or (self.min >= MAXREPEAT):
+            return None
+        if self._regexp is None:
+            # match anything
+            pattern = r'[\s\S]' + _quantifier(self.min, self.max)
+        else:
+            pattern = self._regexp.pattern
+        # an atomic group doesn't give back characters to the following rules,
+        # like `parse()` doesn't
+        return '(?>{pattern})'.format(pattern=pattern)
+
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        if self.chars is self.exclude is None:
-            # match anything
-            match_len = len(s)
-        elif len(s):
-            for match_len, c in enumerate(s):
-                if not self._predicate(c):
-                    break
-            else:
-                match_len += 1
-        else:
-            match_len = 0
-        if self.max is not None:
-            match_len = min(match_len, self.max)
-        if match_len < self.min:
+        if (self.max == 1) and (self.min == 1) and (self._allowed is not None):
+            # a single character only needs one lookup in the frozen set,
+            # which is cheaper than a call into the regex engine
+            if (pos < len(s)) and (s[pos] in self._allowed):
+                context.update(
+                    _match=s[pos],
+                    _pos=pos + 1,
+                )
+                return context
+            raise NoMatchError(rule=self, s=s, pos=pos)
+        if self._regexp is not None:
+            m = self._regexp.match(s, pos)
+            if not m:
+                # not enough matching characters
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            context.update(
+                _match=m.group(0),
+                _pos=m.end(),
+            )
+            return context
+        if self._class is not None:
+            # an impossible repetition range, or more repetitions than any string has
+            raise NoMatchError(rule=self, s=s, pos=pos)
+        # match anything
+        end = len(s) if self.max is None else min(len(s), pos + self.max)
+        if end - pos < self.min:
             # not enough matching characters
-            raise NoMatchError(rule=self, unparsed=s)
+            raise NoMatchError(rule=self, s=s, pos=pos)
         context.update(
-            _match=s[:match_len],
-            _unparsed=s[match_len:],
+            _match=s[pos:end],
+            _pos=end,
         )
         return context
 
@@ -388,13 +970,84 @@ class Chars(Rule):
             # and has no step (which would be a delimiter for a Repeat rule)
             overrides = dict(min=item.start or 0, max=item.stop)
         if overrides:
-            return Chars(self.chars, self.exclude, **overrides)
+            key = self._key(type(self), self.chars, self.exclude, overrides['min'], overrides['max'])
+            rule = self._instances.get(key)
+            if rule is None:
+                # reuse the precompiled character class, only the limits change;
+                # bypass `__new__`, which would return a shared instance
+                rule = super(Chars, type(self)).__new__(type(self))
+                for name in Chars.__slots__:
+                    setattr(rule, name, getattr(self, name))
+                rule.min = overrides['min']
+                rule.max = overrides['max']
+                rule._regexp = rule._compile()
+                self._instances[key] = rule
+            return rule
         else:
             return super(Chars, self).__getitem__(item)
 
 
+class _FusedRun(Rule):
+    """Run of consecutive sequence rules fused into a single regular expression.
+
+    Built by `Sequence` from rules that provide a `Rule.fragment()`.
+    """
+
+    __slots__ = ('rules', '_regexp')
+
+    _atomic = True
+
+    _pure = True
+
+    def __init__(self, rules):
+        """Initializer.
+
+        :param rules: rules to fuse
+        """
+        super(_FusedRun, self).__init__()
+        self.rules = tuple(rules)
+        self._regexp = re.compile(''.join(rule.fragment() for rule in self.rules))
+
+    def __repr__(self):
+        """Render representation."""
+        return ' '.join(map(repr, self.rules))
+
+    def parse(self, s, pos, context):
+        """Parse a string into the parse context.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        :raises: `NoMatchError`
+        """
+        m = self._regexp.match(s, pos)
+        if m:
+            context.update(
+                _match=m.group(0),
+                _pos=m.end(),
+            )
+            return context
+        # parse the rules one by one, so that the error is raised by the rule
+        # that actually failed to match
+        matches = []
+        for rule in self.rules:
+            context = rule.parse(s, pos, context)
+            matches.append(context['_match'])
+            pos = context['_pos']
+        context['_match'] = ''.join(matches)
+        return context
+
+
 class Sequence(Rule):
-    """Rule matching a sequence of rules in order."""
+    """Rule matching a sequence of rules in order.
+
+    Runs of consecutive rules that can be expressed as regular expressions
+    (see `Rule.fragment()`) are fused into a single regular expression
+    on first use.
+    """
+
+    __slots__ = ('rules', '_plan', '_atomic', '_pure')
 
     def __init__(self, *rules):
         """Initializer.
@@ -402,7 +1055,88 @@ class Sequence(Rule):
         :param rules: rules to match
         """
         super(Sequence, self).__init__()
-        self.rules = tuple(ensure_rule(rule) for rule in rules)
+        collapsed = []
+        for rule in self._flatten(rules):
+            if isinstance(rule, WS) and collapsed and isinstance(collapsed[-1], WS):
+                # whitespace was already skipped by the previous rule
+                continue
+            collapsed.append(rule)
+        self.rules = tuple(collapsed)
+        # a sequence can fail after some of its rules have matched, so it's
+        # only atomic if none of them could have captured anything by then
+        self._pure = all(rule._pure for rule in self.rules)
+        self._atomic = self._pure
+        # the rules to actually parse, with fused runs; built lazily, as
+        # intermediate sequences built by `+` are never parsed
+        self._plan = None
+
+    def _build_plan(self):
+        """Build the rules to actually parse.
+
+        The rules following a `Cut` are parsed as a separate sequence,
+        whose failures are raised as `CutError`.
+
+        :returns: tuple of `Rule` or None
+        """
+        for i, rule in enumerate(self.rules):
+            if isinstance(rule, Cut):
+                plan = self._fuse(self.rules[:i])
+                if i + 1 < len(self.rules):
+                    plan += (_Committed(Sequence(*self.rules[i + 1:])),)
+                return plan
+        return self._fuse(self.rules)
+
+    def _fuse(self, rules):
+        """Fuse runs of rules that can be expressed as regular expressions.
+
+        Atomic groups are needed to keep regular expressions from backtracking
+        into a previous rule, so this requires Python 3.11 or later.
+
+        Whitespace skips are replaced by None, which `parse()` handles inline.
+
+        :param rules: rules to fuse
+        :returns: tuple of `Rule` or None
+        """
+        if sys.version_info < (3, 11):
+            return tuple(None if isinstance(rule, WS) else rule for rule in rules)
+        plan = []
+        run = []
+        for rule in rules + (None,):
+            if (rule is not None) and (rule.fragment() is not None):
+                run.append(rule)
+                continue
+            if len(run) > 1:
+                plan.append(_FusedRun(run))
+            else:
+                plan.extend(run)
+            run = []
+            if rule is not None:
+                plan.append(None if isinstance(rule, WS) else rule)
+        return tuple(plan)
+
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return self.rules
+
+    def _spliceable(self):
+        """Check if this sequence can be spliced into an enclosing one.
+
+        A cut covers the rest of the sequence it is in, so a sequence with a
+        `Cut` of its own is kept whole.
+
+        :returns: bool
+        """
+        return not any(isinstance(rule, Cut) for rule in self.rules)
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        return self.rules[0].first_chars() if self.rules else None
 
     def __repr__(self):
         """Render representation.
@@ -413,25 +1147,38 @@ class Sequence(Rule):
             rules=' '.join(map(repr, self.rules)),
         )
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
+        # parse keys are accessed as items rather than attributes throughout
+        # the inner loops, which skips the `Context.__getattr__` fallback
+        skip_ws = WS._regexp.match
         matches = []
-        context._unparsed = s
-        for rule in self.rules:
-            iter_context = rule.parse(context._unparsed, context=context)
+        context['_pos'] = pos
+        rules = self._plan
+        if rules is None:
+            rules = self._plan = self._build_plan()
+        for rule in rules:
+            if rule is None:
+                # whitespace skip, its match is always empty
+                pos = skip_ws(s, pos).end()
+                continue
+            iter_context = rule.parse(s, pos, context)
             if iter_context is not context:
                 context.update(iter_context)
             # discard any received capturable value
             if '_capturable' in context:
                 del context['_capturable']
-            matches.append(context._match)
+            matches.append(context['_match'])
+            pos = context['_pos']
         context.update(
             _match=''.join(matches),
+            _pos=pos,
         )
         return context
 
@@ -442,7 +1189,7 @@ class Sequence(Rule):
         :returns: `Sequence`
         """
         other = ensure_rule(other)
-        if isinstance(other, Sequence):
+        if isinstance(other, Sequence) and other._spliceable():
             # join together two sequences
             other = other.rules
         else:
@@ -457,7 +1204,7 @@ class Sequence(Rule):
         :returns: `Sequence`
         """
         other = ensure_rule(other)
-        if isinstance(other, Sequence):
+        if isinstance(other, Sequence) and other._spliceable():
             # join together two sequences
             other = other.rules
         else:
@@ -474,7 +1221,7 @@ class Sequence(Rule):
         :returns: `Sequence`
         """
         other = ensure_rule(other)
-        if isinstance(other, Sequence):
+        if isinstance(other, Sequence) and other._spliceable():
             # join together two sequences
             other = other.rules
         else:
@@ -491,7 +1238,7 @@ class Sequence(Rule):
         :returns: `Sequence`
         """
         other = ensure_rule(other)
-        if isinstance(other, Sequence):
+        if isinstance(other, Sequence) and other._spliceable():
             # join together two sequences
             other = other.rules
         else:
@@ -503,13 +1250,92 @@ class Sequence(Rule):
 class Alternatives(Rule):
     """Rule matching one of a set of alternatives."""
 
+    __slots__ = ('rules', '_choices', '_dispatch', '_fallback', '_regexp')
+
+    _atomic = True
+
     def __init__(self, *rules):
         """Initializer.
 
         :param rules: rules to match
         """
         super(Alternatives, self).__init__()
-        self.rules = tuple(ensure_rule(rule) for rule in rules)
+        self.rules = tuple(self._flatten(rules))
+        self._choices = self._merge_literals()
+        self._dispatch, self._fallback = self._build_dispatch()
+        # single regular expression matching all the alternatives at once, if
+        # possible; compiled lazily, as intermediate alternatives built by `|`
+        # are never parsed
+        self._regexp = None
+
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return self.rules
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        # a cut commits to the alternatives it is in, and no further
+        return False
+
+    def _spliceable(self):
+        """Check if these alternatives can be spliced into enclosing ones.
+
+        A cut in one of the alternatives would then commit to the enclosing
+        ones as well, so alternatives that may cut are kept whole.
+
+        :returns: bool
+        """
+        return not any(rule._may_cut() for rule in self.rules)
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        chars = [rule.first_chars() for rule in self.rules]
+        if None in chars:
+            return None
+        return frozenset().union(*chars)
+
+    def fragment(self):
+        """Return a regular expression that matches exactly like this rule.
+
+        All but the last alternative must be known not to match an empty string,
+        the zero-length match check in `parse()` can't be done by the regular
+        expression engine.
+
+        :returns: str, or None if the rule cannot be expressed as a fragment
+        """
+        fragments = [rule.fragment() for rule in self._choices]
+        if None in fragments:
+            return None
+        if any(rule.first_chars() is None for rule in self._choices[:-1]):
+            return None
+        if len(fragments) == 1:
+            return fragments[0]
+        # an atomic group commits to the first matching alternative, like `parse()` does
+        return '(?>{alternatives})'.format(alternatives='|'.join(fragments))
+
+    def _compile(self):
+        """Compile the alternatives into a single regular expression.
+
+        Atomic groups are used by the fragments of the alternatives, so this
+        requires Python 3.11 or later.
+
+        :returns: `re.Pattern`, or False if the alternatives cannot be compiled
+        """
+        if (sys.version_info < (3, 11)) or (len(self._choices) < 2):
+            return False
+        fragment = self.fragment()
+        if fragment is None:
+            return False
+        return re.compile(fragment)
 
     def __repr__(self):
         """Render representation.
@@ -520,25 +1346,106 @@ class Alternatives(Rule):
             rules=' | '.join(map(repr, self.rules)),
         )
 
-    def parse(self, s, context):
+    def _merge_literals(self):
+        """Merge runs of adjacent literal alternatives into single `Literal` rules.
+
+        A `Literal` with several literals matches them in order in a single pass
+        of the regex engine, which has the same outcome as trying each of them
+        in turn.
+
+        :returns: tuple of rules to try in order
+        """
+        choices = []
+        run = []
+
+        def flush():
+            if len(run) > 1:
+                choices.append(Literal(
+                    *(literal for rule in run for literal in rule.literals),
+                    casefold=run[0].casefold
+                ))
+            else:
+                choices.extend(run)
+            del run[:]
+
+        for rule in self.rules:
+            if (type(rule) is Literal) and all(rule.literals):
+                if run and (run[0].casefold != rule.casefold):
+                    flush()
+                run.append(rule)
+            else:
+                flush()
+                choices.append(rule)
+        flush()
+        return tuple(choices)
+
+    def _build_dispatch(self):
+        """Index the alternatives by the first characters they can match.
+
+        Each first character maps to the alternatives that can possibly match it,
+        in their original order; alternatives that don't have a known set of
+        first characters are included everywhere, and make up the fallback
+        for all other characters.
+
+        :returns: tuple of dispatch dict (or None if no alternative can be indexed) and fallback tuple
+        """
+        choices = self._choices
+        chars = [rule.first_chars() for rule in choices]
+        fallback = tuple(rule for rule, first in zip(choices, chars) if first is None)
+        if len(fallback) == len(choices):
+            return None, fallback
+        dispatch = {
+            c: tuple(rule for rule, first in zip(choices, chars) if (first is None) or (c in first))
+            for c in frozenset().union(*(first for first in chars if first is not None))
+        }
+        return dispatch, fallback
+
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
-        for i, rule in enumerate(self.rules):
+        regexp = self._regexp
+        if regexp is None:
+            regexp = self._regexp = self._compile()
+        if regexp:
+            m = regexp.match(s, pos)
+            if not m:
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            context.update(
+                _match=m.group(0),
+                _pos=m.end(),
+            )
+            return context
+        if self._dispatch is None:
+            rules = self._choices
+        else:
+            # only try the alternatives that can match the first character;
+            # keys are casefolded characters, which casefold to themselves,
+            # so only casefold the input if it's not a key as it is
+            c = s[pos:pos + 1]
+            rules = self._dispatch.get(c)
+            if rules is None:
+                rules = self._dispatch.get(c.casefold()[:1], self._fallback)
+        last = self._choices[-1]
+        for rule in rules:
             try:
-                iter_context = rule.parse(s, context=context.copy())
+                iter_context = rule.parse(s, pos, context if rule._atomic else context.copy())
+            except CutError as e:
+                # committed to this alternative, the cut doesn't reach any further
+                raise NoMatchError(rule=e.rule, s=s, pos=e.pos)
             except NoMatchError:
                 continue
-            if (s == iter_context._unparsed) and (i + 1 < len(self.rules)):
+            if (iter_context['_pos'] == pos) and (rule is not last):
                 raise RuntimeError('Zero-length match in non-final Alternatives rule at {s!r}'.format(
-                    s=s,
+                    s=s[pos:],
                 ))
             return iter_context
-        raise NoMatchError(rule=self, unparsed=s)
+        raise NoMatchError(rule=self, s=s, pos=pos)
 
     def __or__(self, other):
         """Append a rule to the list of alternatives.
@@ -563,24 +1470,70 @@ class Reference(Rule):
     """Dynamic reference to a rule.
 
     This is necessary for self-referential rules.
+
+    A function that takes no arguments cannot depend on the parse context,
+    so it is only called once, on first use, and the result is reused.
     """
 
+    __slots__ = ('fn', 'target', '_static')
+
     def __init__(self, fn):
+        """Initializer.
+
+        :param fn: function returning the referenced rule, called with the parse context
+            (or without arguments, if it doesn't accept any)
+        """
         super(Reference, self).__init__()
         self.fn = fn
+        # bound by `Rule.link()` for references that do not depend on the context
+        self.target = None
+        try:
+            self._static = not inspect.signature(fn).parameters
+        except (TypeError, ValueError):
+            # no signature available, assume the function wants the context
+            self._static = False
 
     def __repr__(self):
         """Render representation."""
         return '<Ref>'
 
-    def parse(self, s, context):
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return () if self.target is None else (self.target,)
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        # the target may be unresolved, or lead back here
+        return True
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        return None if self.target is None else self.target.first_chars()
+
+    def parse(self, s, pos, context):
         """Parse a string into the parse context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        return self.fn(context).parse(s, context=context)
+        rule = self.target
+        if rule is None:
+            if self._static:
+                rule = self.target = self.fn()
+            else:
+                rule = self.fn(context)
+        return rule.parse(s, pos, context)
 
 
 # shorthand names
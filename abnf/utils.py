@@ -1,16 +1,19 @@
-from collections import OrderedDict
-from functools import wraps
+from bisect import bisect_right
 
 
-__all__ = ['CharRange', 'Context']
+__all__ = ['CharRange', 'Context', 'LazyValue']
 
 
-class Context(OrderedDict):
+class Context(dict):
     """Container for parse context.
 
-    This is an ordered dictionary that also supports attribute access.
+    This is a dictionary (ordered by insertion like any `dict`) that also
+    supports attribute access.
     """
 
+    # attributes are stored as items, instances never need a `__dict__`
+    __slots__ = ()
+
     def __getattr__(self, name):
         """Convenience attribute accessor."""
         return self[name]
@@ -23,17 +26,12 @@ class Context(OrderedDict):
         """Convenience attribute accessor."""
         del self[name]
 
-    def __repr__(self):
-        """Render a representation similar to a dict.
+    def copy(self):
+        """Shallow copy that is still a `Context`.
 
-        :returns: str
+        :returns: `Context`
         """
-        return '{{{items}}}'.format(
-            items=', '.join(
-                '{key!r}: {value!r}'.format(key=key, value=value)
-                for key, value in self.items()
-            ),
-        )
+        return Context(self)
 
     def clean(self):
         """Clean up internal sunder keys."""
@@ -43,39 +41,106 @@ class Context(OrderedDict):
         return self
 
 
-def _relay_op(method):
-    """Relay a method to the underlying chars set.
+class LazyValue(object):
+    """Matched text whose structured value is parsed on first access."""
 
-    Binary operations will attempt to cast their argument to `CharRange`
-    if it is a string or an integer, allowing for ``CharRange(...) | 'abc'``
-    usage for convenience.
+    __slots__ = ('rule', 's', '_parsed', '_value')
 
-    If return value of the operation is a set, it will be cast to `CharRange`
-    (e.g. a & b, a | b), otherwise will be returned as-is (len(cr), iter(cr), etc).
+    def __init__(self, rule, s):
+        """Initializer.
 
-    :param method: name of the method to relay to
-    :returns: function
+        :param rule: rule to parse the text with
+        :param s: matched text
+        """
+        self.rule = rule
+        self.s = s
+        self._parsed = False
+        self._value = None
+
+    def __str__(self):
+        """Stringify to the matched text."""
+        return self.s
+
+    def __repr__(self):
+        """Render representation.
+
+        :returns: str
+        """
+        return '<LazyValue {s!r}>'.format(s=self.s)
+
+    @property
+    def value(self):
+        """Parse the matched text, or return the previously parsed value.
+
+        :returns: `Context`
+        :raises: `NoMatchError`
+        """
+        if not self._parsed:
+            self._value = self.rule(self.s)
+            self._parsed = True
+        return self._value
+
+
+def _intervals(codes):
+    """Collapse codepoints into sorted, non-overlapping intervals.
+
+    :param codes: iterable of codepoints
+    :returns: tuple of ``(first, last)`` codepoint tuples
     """
-    method = getattr(set, method)
+    intervals = []
+    for code in sorted(set(codes)):
+        if intervals and (intervals[-1][1] == code - 1):
+            intervals[-1] = (intervals[-1][0], code)
+        else:
+            intervals.append((code, code))
+    return tuple(intervals)
+
+
+def _set_op(keep):
+    """Build a set operation working on the intervals of two ranges.
 
-    @wraps(method)
-    def op(self, other=None):
-        if other is None:
-            return method(self.chars)
+    The argument will be cast to `CharRange` if it is a string or an integer,
+    allowing for ``CharRange(...) | 'abc'`` usage for convenience.
+
+    :param keep: function telling if a codepoint in the first and/or second range is in the result
+    :returns: function
+    """
+    def op(self, other):
         if isinstance(other, (str, int)):
             other = type(self)(other)
         elif not isinstance(other, CharRange):
             return NotImplemented
-        value = method(self.chars, other.chars)
-        if isinstance(value, set):
-            value = type(self)(value)
-        return value
+        # the result can only change at the boundaries of the intervals,
+        # so only test one codepoint of each segment between them
+        points = sorted(set(
+            point
+            for first, last in self.intervals + other.intervals
+            for point in (first, last + 1)
+        ))
+        intervals = []
+        for first, end in zip(points, points[1:]):
+            if not keep(first in self, first in other):
+                continue
+            if intervals and (intervals[-1][1] == first - 1):
+                intervals[-1] = (intervals[-1][0], end - 1)
+            else:
+                intervals.append((first, end - 1))
+        result = type(self).__new__(type(self))
+        result._set_intervals(tuple(intervals))
+        return result
 
     return op
 
 
 class CharRange(object):
-    """Range of characters."""
+    """Range of characters.
+
+    The characters are kept as sorted intervals of codepoints, so even huge
+    ranges are cheap to build, test and combine; the set of characters
+    is only built when `chars` is accessed.
+    """
+
+    __slots__ = ('intervals', '_firsts', '_chars')
 
     def __init__(self, start, end=None):
         """Initializer.
@@ -84,18 +149,42 @@ class CharRange(object):
         :param end: end of range or None
         """
         if end is None:
-            chars = chr(start) if isinstance(start, int) else start
+            if isinstance(start, CharRange):
+                intervals = start.intervals
+            elif isinstance(start, int):
+                intervals = ((start, start),)
+            else:
+                intervals = _intervals(map(ord, start))
         else:
             if not isinstance(start, int):
                 start = ord(start)
             if not isinstance(end, int):
                 end = ord(end)
-            chars = (chr(c) for c in range(start, end + 1))
-        self.chars = set(chars)
+            intervals = ((start, end),) if start <= end else ()
+        self._set_intervals(intervals)
+
+    def _set_intervals(self, intervals):
+        """Set the intervals, and reset the derived lookup data.
+
+        :param intervals: tuple of ``(first, last)`` codepoint tuples
+        """
+        self.intervals = intervals
+        self._firsts = tuple(first for first, last in intervals)
+        self._chars = None
+
+    @property
+    def chars(self):
+        """Set of the characters in the range.
+
+        :returns: frozenset
+        """
+        if self._chars is None:
+            self._chars = frozenset(self)
+        return self._chars
 
     def __str__(self):
         """Stringify to the list of matched characters."""
-        return ''.join(sorted(self.chars))
+        return ''.join(self)
 
     def __repr__(self):
         """Render representation.
@@ -104,19 +193,69 @@ class CharRange(object):
         """
         return '<CharRange {chars!r}>'.format(chars=str(self))
 
-    # all set operations are relayed to the underlying `chars` set
-    __iter__ = _relay_op('__iter__')
-    __len__ = _relay_op('__len__')
-    __contains__ = _relay_op('__contains__')
-    __le__ = _relay_op('__le__')
-    __lt__ = _relay_op('__lt__')
-    __ge__ = _relay_op('__ge__')
-    __gt__ = _relay_op('__gt__')
-    __or__ = _relay_op('__or__')
-    __and__ = _relay_op('__and__')
-    __sub__ = _relay_op('__sub__')
-    __xor__ = _relay_op('__xor__')
+    def __iter__(self):
+        """Iterate over the characters in the range, in codepoint order."""
+        for first, last in self.intervals:
+            for code in range(first, last + 1):
+                yield chr(code)
+
+    def __len__(self):
+        """Count the characters in the range.
+
+        :returns: int
+        """
+        return sum(last - first + 1 for first, last in self.intervals)
+
+    __or__ = _set_op(lambda a, b: a or b)
+    __and__ = _set_op(lambda a, b: a and b)
+    __sub__ = _set_op(lambda a, b: a and not b)
+    __xor__ = _set_op(lambda a, b: a != b)
+
+    def __le__(self, other):
+        """Test if the range is a subset of another range."""
+        if isinstance(other, (str, int)):
+            other = type(self)(other)
+        elif not isinstance(other, CharRange):
+            return NotImplemented
+        return not (self - other).intervals
+
+    def __lt__(self, other):
+        """Test if the range is a proper subset of another range."""
+        if isinstance(other, (str, int)):
+            other = type(self)(other)
+        elif not isinstance(other, CharRange):
+            return NotImplemented
+        return (self <= other) and (self.intervals != other.intervals)
+
+    def __ge__(self, other):
+        """Test if the range is a superset of another range."""
+        if isinstance(other, (str, int)):
+            other = type(self)(other)
+        elif not isinstance(other, CharRange):
+            return NotImplemented
+        return other <= self
+
+    def __gt__(self, other):
+        """Test if the range is a proper superset of another range."""
+        if isinstance(other, (str, int)):
+            other = type(self)(other)
+        elif not isinstance(other, CharRange):
+            return NotImplemented
+        return other < self
+
+    def __contains__(self, c):
+        """Test if a character is in the range.
+
+        :param c: character or codepoint
+        :returns: bool
+        """
+        if not isinstance(c, int):
+            if not (isinstance(c, str) and (len(c) == 1)):
+                return False
+            c = ord(c)
+        i = bisect_right(self._firsts, c) - 1
+        return (i >= 0) and (c <= self.intervals[i][1])
 
     def copy(self):
         """Return a copy."""
-        return type(self)(self.chars)
+        return type(self)(self)
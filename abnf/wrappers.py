@@ -1,5 +1,9 @@
-from .rules import ensure_rule, Literal, NoMatchError, Rule
-from .utils import Context
+import re
+import sys
+from operator import itemgetter
+
+from .rules import Chars, ensure_rule, Literal, MAXREPEAT, NoMatchError, Rule
+from .utils import Context, LazyValue
 
 
 __all__ = [
@@ -8,17 +12,21 @@ __all__ = [
     'CaseFold',
     'Debug',
     'Ignore',
+    'Lazy',
     'Mapping',
+    'Memoize',
     'Optional',
     'Repeat',
     'Transform',
-    'N', 'NC', 'Ign', 'Map', 'Opt', 'Rep', 'XF',
+    'N', 'NC', 'Ign', 'Map', 'Memo', 'Opt', 'Rep', 'XF',
 ]
 
 
 class RuleWrapper(Rule):
     """Rule that wraps another Rule."""
 
+    __slots__ = ('rule',)
+
     def __init__(self, rule):
         """Initializer.
 
@@ -34,59 +42,94 @@ class RuleWrapper(Rule):
         """
         return repr(self.rule)
 
-    def parse(self, s, context):
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return (self.rule,)
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        return self.rule.first_chars()
+
+    def parse(self, s, pos, context):
         """Relay the parse to the underlying rule.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        return self.rule.parse(s, context=context)
+        return self.rule.parse(s, pos, context)
 
 
 class Debug(RuleWrapper):
     """Break debugger before evaluating the wrapped rule."""
 
-    def parse(self, s, context):
+    __slots__ = ()
+
+    def parse(self, s, pos, context):
         """Invoke the debugger."""
         import pdb
         pdb.set_trace()
-        match = super(Debug, self).parse(s, context)
+        match = self.rule.parse(s, pos, context)
         return match
 
 
 class FullMatch(RuleWrapper):
     """Match the full string, leaving no remainder."""
 
+    __slots__ = ()
+
     def __repr__(self):
         """Render representation."""
         return '{rule!r} <END>'.format(rule=self.rule)
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Assert there's no unparsed leftover after match.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
-        context = super(FullMatch, self).parse(s, context=context)
-        if context._unparsed:
-            raise NoMatchError(rule=self, unparsed=context._unparsed)
+        context = self.rule.parse(s, pos, context)
+        if context['_pos'] < len(s):
+            raise NoMatchError(rule=self, s=s, pos=context['_pos'])
         return context
 
 
 class Optional(RuleWrapper):
     """Optionally match a rule."""
 
+    __slots__ = ('default', '_has_default', '_first_chars')
+
+    _atomic = True
+
     def __init__(self, rule, default=None):
         """Initializer.
 
         :param rule: rule to wrap
-        :param default: value to return in case of no match (defaults to '')
+        :param default: value to capture in case of no match (defaults to ''); the match itself is always empty
         """
         super(Optional, self).__init__(rule)
+        if type(self.rule) is Optional:
+            # the inner optional always matches, so this one would never
+            # fall back to its own default; unwrap it instead
+            default = self.rule.default if self.rule._has_default else None
+            self.rule = self.rule.rule
+        # only a default that was actually given is captured; tested here once,
+        # rather than comparing arbitrary default values with '' on every parse
+        self._has_default = default is not None
         self.default = default if default is not None else ''
+        # characters the rule can start with; found after the first parse,
+        # once static references are resolved
+        self._first_chars = None
 
     def __repr__(self):
         """Render representation."""
@@ -99,26 +142,69 @@ class Optional(RuleWrapper):
         """
         return self
 
-    def parse(self, s, context):
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        return None
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        # failures of the rule are never raised, cut or not
+        return False
+
+    def _no_match(self, pos, context):
+        """Record an empty match, with the default as its capturable value.
+
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        """
+        context.update(
+            _match='',
+            _pos=pos,
+        )
+        if self._has_default:
+            context['_capturable'] = self.default
+        return context
+
+    def parse(self, s, pos, context):
         """Return a default match in case rule does not match.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
+        first_chars = self._first_chars
+        if first_chars:
+            c = s[pos:pos + 1]
+            if (c not in first_chars) and (c.casefold()[:1] not in first_chars):
+                # the rule can't match the next character, so don't raise
+                # and catch a `NoMatchError` to find out
+                return self._no_match(pos, context)
         try:
-            context = super(Optional, self).parse(s, context=context.copy())
+            context = self.rule.parse(s, pos, context if self.rule._atomic else context.copy())
         except NoMatchError:
-            context.update(
-                _match='',
-                _unparsed=s,
-            )
+            context = self._no_match(pos, context)
+        if first_chars is None:
+            try:
+                self._first_chars = self.rule.first_chars() or False
+            except RecursionError:
+                # left recursion through resolved references
+                self._first_chars = False
         return context
 
 
 class Capture(RuleWrapper):
     """Capture rule value in the parse context."""
 
+    __slots__ = ('name', 'transform', 'raw')
+
     def __init__(self, rule, name, transform=None, raw=None):
         """Initializer.
 
@@ -128,7 +214,8 @@ class Capture(RuleWrapper):
         """
         super(Capture, self).__init__(rule)
         assert not name.startswith('_'), 'Capture name cannot start with underscore'
-        self.name = name
+        # interned names are compared by identity when stored in the context
+        self.name = sys.intern(name)
         self.transform = transform
         self.raw = False if raw is None else raw
 
@@ -142,23 +229,22 @@ class Capture(RuleWrapper):
             rule=self.rule,
         )
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Store the match as a named value in the context.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        context = super(Capture, self).parse(s, context=context)
+        context = self.rule.parse(s, pos, context)
         if self.raw or ('_capturable' not in context):
-            value = context._match
+            value = context['_match']
         else:
-            value = context._capturable
+            value = context['_capturable']
         if self.transform:
             value = self.transform(value)
-        context.update({
-            self.name: value,
-        })
+        context[self.name] = value
         return context
 
     def __pos__(self):
@@ -178,6 +264,8 @@ class Capture(RuleWrapper):
 class Transform(RuleWrapper):
     """Transform the value of a match."""
 
+    __slots__ = ('fn',)
+
     def __init__(self, rule, fn):
         """Initializer.
 
@@ -186,40 +274,66 @@ class Transform(RuleWrapper):
         """
         super(Transform, self).__init__(rule)
         self.fn = fn if callable(fn) else lambda m: fn
+        if type(self.rule) is Transform:
+            # fold nested transforms into a single wrapper
+            inner, outer = self.rule.fn, self.fn
+            self.rule = self.rule.rule
+            self.fn = lambda m: outer(inner(m))
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Transform the match.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        context = super(Transform, self).parse(s, context=context)
-        context._match = self.fn(context._match)
+        context = self.rule.parse(s, pos, context)
+        context['_match'] = self.fn(context['_match'])
         return context
 
 
-def Ignore(rule):
-    """Ignore the value of the matched rule.
+class Ignore(RuleWrapper):
+    """Ignore the value of the matched rule."""
 
-    :param rule: rule to wrap
-    :returns: `Transform`
-    """
-    return Transform(rule, lambda v: '')
+    __slots__ = ()
 
+    def parse(self, s, pos, context):
+        """Discard the match.
 
-def CaseFold(rule):
-    """Casefold the value of a match.
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        """
+        context = self.rule.parse(s, pos, context)
+        context['_match'] = ''
+        return context
 
-    :param rule: rule to wrap
-    :returns: `Transform`
-    """
-    return Transform(rule, lambda v: v.casefold())
+
+class CaseFold(RuleWrapper):
+    """Casefold the value of a match."""
+
+    __slots__ = ()
+
+    def parse(self, s, pos, context):
+        """Casefold the match.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        """
+        context = self.rule.parse(s, pos, context)
+        context['_match'] = context['_match'].casefold()
+        return context
 
 
 class Assert(RuleWrapper):
     """Assert an additional condition on a rule match."""
 
+    __slots__ = ('condition',)
+
     def __init__(self, rule, condition, *args, **kwargs):
         """Initializer.
 
@@ -229,23 +343,130 @@ class Assert(RuleWrapper):
         super(Assert, self).__init__(rule, *args, **kwargs)
         self.condition = condition
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Fail a successful match if the condition fails.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
-        context = super(Assert, self).parse(s, context=context)
+        context = self.rule.parse(s, pos, context)
         if not self.condition(context):
-            raise NoMatchError(rule=self, unparsed=s)
+            raise NoMatchError(rule=self, s=s, pos=pos)
+        return context
+
+
+class Lazy(RuleWrapper):
+    """Defer the structured parse of a match until its value is needed.
+
+    The wrapped rule only needs to find the extent of the match cheaply
+    (e.g. everything up to the end of a line); the capturable value is a
+    `LazyValue` that parses the matched text with the structured rule
+    on first access.
+    """
+
+    __slots__ = ('structured',)
+
+    def __init__(self, rule, structured):
+        """Initializer.
+
+        :param rule: rule to wrap
+        :param structured: rule to parse the matched text with on access
+        """
+        super(Lazy, self).__init__(rule)
+        self.structured = ensure_rule(structured)
+
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        return (self.rule, self.structured)
+
+    def parse(self, s, pos, context):
+        """Capture the match as a lazily parsed value.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        """
+        context = self.rule.parse(s, pos, context)
+        context['_capturable'] = LazyValue(self.structured, context['_match'])
+        return context
+
+
+class Memoize(RuleWrapper):
+    """Memoize the outcome of a rule at each input position.
+
+    Avoids reparsing the same rule at the same position when an enclosing
+    rule backtracks. Memoization only pays off for rules that are reached
+    repeatedly from competing alternatives, so rules need to opt in;
+    recursive rules are a good fit, e.g. ``Memo(Ref(lambda ctx: G.comment))``.
+    The wrapped rule must not depend on values in the parse context.
+    """
+
+    __slots__ = ()
+
+    def parse(self, s, pos, context):
+        """Replay the memoized outcome, or parse and memoize it.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :returns: `Context`
+        :raises: `NoMatchError`
+        """
+        memo = context.get('_memo')
+        if memo is None:
+            # not running within a top-level parse, there's no memo table
+            return self.rule.parse(s, pos, context)
+        # each rule gets its own table keyed by position only
+        table = memo.get(id(self))
+        if table is None:
+            table = memo[id(self)] = {}
+        entry = table.get(pos)
+        if entry is None:
+            # parse into a context of its own, so that the outcome doesn't
+            # depend on what the first caller happened to have in its context
+            fresh = Context()
+            fresh['_memo'] = memo
+            if 'parent' in context:
+                fresh['parent'] = context['parent']
+            try:
+                match = self.rule.parse(s, pos, fresh)
+            except NoMatchError as e:
+                table[pos] = (e.rule, e.pos, type(e))
+                raise
+            # remember everything the rule set, including `_match` and `_pos`
+            entry = table[pos] = (
+                {
+                    name: value
+                    for name, value in match.items()
+                    if name not in ('_memo', 'parent')
+                },
+            )
+        if len(entry) == 3:
+            # failures are memoized as (rule, pos, exception type), which is told
+            # apart by length since the failing rule isn't necessarily known
+            raise entry[2](rule=entry[0], s=s, pos=entry[1])
+        updates = entry[0]
+        if ('_capturable' in context) and ('_capturable' not in updates):
+            # a capturable value left over in the caller's context isn't the rule's
+            del context['_capturable']
+        context.update(updates)
         return context
 
 
 class Repeat(RuleWrapper):
     """Repeatly match a rule in sequence."""
 
+    __slots__ = ('delimiter', 'min', 'max', '_delim_rule', '_first_chars', '_raw', '_scanners')
+
+    _atomic = True
+
     def __init__(self, rule, delimiter=None, min=0, max=None):
         """Initializer.
 
@@ -258,6 +479,103 @@ class Repeat(RuleWrapper):
         self.delimiter = ensure_rule(delimiter)
         self.min = min
         self.max = max
+        # build the rule for subsequent repetitions once, not on every parse
+        if self.delimiter is not None:
+            self._delim_rule = self.delimiter + self.rule
+        else:
+            self._delim_rule = self.rule
+        # characters the first and the subsequent repetitions can start with;
+        # found after the first parse, once static references are resolved
+        self._first_chars = None
+        # rules with a fragment match exactly the input text, so the matches
+        # of all repetitions together are just a slice of the input
+        self._raw = (self.rule.fragment() is not None) and (
+            (self.delimiter is None) or (self.delimiter.fragment() is not None)
+        )
+        # compiled on first parse, see `_compile()`
+        self._scanners = None
+
+    def _compile(self):
+        """Compile the first and delimited repetitions into regular expressions.
+
+        Only raw repetitions can be compiled; fragments use atomic groups,
+        so this requires Python 3.11 or later.
+
+        :returns: tuple of `re.Pattern.match` methods for the first and subsequent repetitions
+            and a `(re.Pattern.match, width)` tuple for the whole run or None, or False
+        """
+        if (sys.version_info < (3, 11)) or not self._raw:
+            return False
+        fragment = self.rule.fragment()
+        delim_fragment = fragment
+        if self.delimiter is not None:
+            delim_fragment = self.delimiter.fragment() + fragment
+        run = None
+        width = self._width()
+        # `re` can't compile an impossible repetition range,
+        # nor repetition counts of `MAXREPEAT` or more
+        compilable = (self.min < MAXREPEAT) and ((self.max is None) or (self.min <= self.max < MAXREPEAT))
+        if (self.delimiter is None) and width and compilable:
+            # the number of repetitions of a fixed width rule follows from
+            # the length of the match, so all of them can be matched at once
+            run = (re.compile('(?:{fragment}){{{min},{max}}}'.format(
+                fragment=fragment,
+                min=self.min,
+                max='' if self.max is None else self.max,
+            )).match, width)
+        return (re.compile(fragment).match, re.compile(delim_fragment).match, run)
+
+    def _width(self):
+        """Return the fixed length of every match of the rule, if it has one.
+
+        :returns: int, or None if matches can differ in length
+        """
+        rule = self.rule
+        if type(rule) is Chars and rule.min == rule.max:
+            return rule.min
+        if type(rule) is Literal and len(rule.literals) == 1:
+            return len(rule.literals[0])
+        return None
+
+    def _find_first_chars(self):
+        """Find the characters the repetitions can start with.
+
+        :returns: tuple of first characters of the rule and delimited rule, or False if both are unknown
+        """
+        try:
+            first_chars = (self.rule.first_chars(), self._delim_rule.first_chars())
+        except RecursionError:
+            # left recursion through resolved references
+            return False
+        if first_chars == (None, None):
+            return False
+        return first_chars
+
+    def children(self):
+        """Return the rules this rule delegates to.
+
+        :returns: tuple of `Rule`
+        """
+        if self.delimiter is None:
+            return (self.rule,)
+        return (self.rule, self.delimiter)
+
+    def _may_cut(self):
+        """Check if a `CutError` can propagate out of this rule.
+
+        :returns: bool
+        """
+        # failures of the rule end the repetition, cut or not
+        return False
+
+    def first_chars(self):
+        """Return the casefolded characters a match can start with.
+
+        :returns: frozenset, or None if unknown or the rule can match an empty string
+        """
+        if not self.min:
+            return None
+        return self.rule.first_chars()
 
     def __repr__(self):
         """Render representation.
@@ -275,55 +593,140 @@ class Repeat(RuleWrapper):
             ) if self.delimiter is not None else '',
         )
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Parse a string.
 
         The capturable value will be a list of the contexts of each repeated match.
         If you need to capture the textual match, you can specify ``Capture(..., flat=True)``.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         :raises: `NoMatchError`
         """
+        if self.max == 0:
+            # zero repetitions always match the empty string, don't bother with the rule
+            if self.min > 0:
+                raise NoMatchError(rule=self, s=s, pos=pos)
+            context.update(
+                _match='',
+                _capturable=[],
+                _pos=pos,
+            )
+            return context
+        scanners = self._scanners
+        if scanners is None:
+            scanners = self._scanners = self._compile()
+        if scanners:
+            return self._scan(s, pos, context, scanners)
         matches = []
-        remainder = s
-        if self.delimiter is not None:
-            delim_rule = self.delimiter + self.rule
-        else:
-            delim_rule = self.rule
-        while True:
-            if (self.max is not None) and (len(matches) >= self.max):
-                break
+        end = len(s)
+        start = pos
+        memo = context.get('_memo')
+        first_chars = self._first_chars
+        # the first match has no delimiter, subsequent matches include the
+        # delimiter (if any); both are switched in locals after the first match,
+        # and everything the loop looks up is bound to a local beforehand
+        parse = self.rule.parse
+        chars = first_chars[0] if first_chars else None
+        delim_parse = self._delim_rule.parse
+        delim_chars = first_chars[1] if first_chars else None
+        append = matches.append
+        limit = self.max
+        while (limit is None) or (len(matches) < limit):
+            if chars is not None:
+                # stop without trying the rule if it can't match the next character
+                c = s[pos:pos + 1]
+                if (c not in chars) and (c.casefold()[:1] not in chars):
+                    break
             # instantiate a fresh context for the iteration
-            # and make the parent context available as a key
-            iter_context = Context(parent=context)
+            # and make the parent context available as a key;
+            # assigning items is cheaper than passing keyword arguments
+            iter_context = Context()
+            iter_context['parent'] = context
+            if memo is not None:
+                # share the memo table of the enclosing parse
+                iter_context['_memo'] = memo
             try:
-                if not matches:
-                    # first match, no delimiter
-                    iter_context = self.rule.parse(remainder, context=iter_context)
-                else:
-                    # subsequent matches include the delimiter (if any)
-                    iter_context = delim_rule.parse(remainder, context=iter_context)
+                iter_context = parse(s, pos, iter_context)
             except NoMatchError:
                 break
-            if remainder == iter_context._unparsed:
+            if iter_context['_pos'] == pos:
                 # a zero-length match will keep matching forever
                 raise RuntimeError('Zero-length match in Repeat rule at {s!r}'.format(
-                    s=remainder,
+                    s=s[pos:],
                 ))
             # discard the parent context, it was only there for the benefit of the child rule
             del iter_context['parent']
-            matches.append(iter_context)
-            remainder = iter_context._unparsed
-            if not remainder:
+            append(iter_context)
+            pos = iter_context['_pos']
+            if pos >= end:
                 break
+            parse = delim_parse
+            chars = delim_chars
+        if first_chars is None:
+            self._first_chars = self._find_first_chars()
         if len(matches) < self.min:
-            raise NoMatchError(rule=self, unparsed=s)
+            raise NoMatchError(rule=self, s=s, pos=start)
         context.update(
-            _match=''.join(match._match for match in matches),
+            # `str.join` builds a list from a generator anyway, hand it one directly
+            _match=s[start:pos] if self._raw else ''.join([match['_match'] for match in matches]),
             _capturable=[match.clean() for match in matches],
-            _unparsed=remainder,
+            _pos=pos,
+        )
+        return context
+
+    def _scan(self, s, pos, context, scanners):
+        """Parse a raw repetition with its compiled regular expressions.
+
+        Raw rules only ever set internal keys in their context, so the context
+        of each repetition is an empty `Context` once cleaned.
+
+        :param s: string to parse
+        :param pos: position in ``s`` to start matching at
+        :param context: parse context
+        :param scanners: result of `_compile()`
+        :returns: `Context`
+        :raises: `NoMatchError`
+        """
+        match, delim_match, run = scanners
+        start = pos
+        if run is not None:
+            run_match, width = run
+            m = run_match(s, pos)
+            if m is None:
+                raise NoMatchError(rule=self, s=s, pos=start)
+            pos = m.end()
+            context.update(
+                _match=s[start:pos],
+                _capturable=[Context() for _ in range((pos - start) // width)],
+                _pos=pos,
+            )
+            return context
+        end = len(s)
+        count = 0
+        limit = self.max
+        while (limit is None) or (count < limit):
+            m = match(s, pos)
+            if m is None:
+                break
+            if m.end() == pos:
+                # a zero-length match will keep matching forever
+                raise RuntimeError('Zero-length match in Repeat rule at {s!r}'.format(
+                    s=s[pos:],
+                ))
+            count += 1
+            pos = m.end()
+            if pos >= end:
+                break
+            match = delim_match
+        if count < self.min:
+            raise NoMatchError(rule=self, s=s, pos=start)
+        context.update(
+            _match=s[start:pos],
+            _capturable=[Context() for _ in range(count)],
+            _pos=pos,
         )
         return context
 
@@ -348,6 +751,8 @@ class Repeat(RuleWrapper):
 class Mapping(Repeat):
     """Transform a capturable list of kvpairs into a mapping."""
 
+    __slots__ = ('key_name', 'value_name', '_pair')
+
     def __init__(self, *args, key_name=None, value_name=None, **kwargs):
         """Initializer.
 
@@ -357,22 +762,21 @@ class Mapping(Repeat):
         :param value_name: name of context value to use for mapping values (defaults to "value")
         """
         super(Mapping, self).__init__(*args, **kwargs)
-        self.key_name = key_name or 'key'
-        self.value_name = value_name or 'value'
+        self.key_name = sys.intern(key_name or 'key')
+        self.value_name = sys.intern(value_name or 'value')
+        self._pair = itemgetter(self.key_name, self.value_name)
 
-    def parse(self, s, context):
+    def parse(self, s, pos, context):
         """Transform the value of the match.
 
         :param s: string to parse
+        :param pos: position in ``s`` to start matching at
         :param context: parse context
         :returns: `Context`
         """
-        context = super(Mapping, self).parse(s, context=context)
+        context = super(Mapping, self).parse(s, pos, context)
         if isinstance(context.get('_capturable'), list):
-            context._capturable = Context(
-                (kvpair[self.key_name], kvpair[self.value_name])
-                for kvpair in match._capturable
-            )
+            context['_capturable'] = Context(map(self._pair, context['_capturable']))
         return context
 
 
@@ -382,6 +786,7 @@ N = Capture     # (N)ame
 NC = CaseFold   # (N)o(C)ase
 Ign = Ignore
 Map = Mapping
+Memo = Memoize
 Opt = Optional
 Rep = Repeat
 XF = Transform
\ No newline at end of file
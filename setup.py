@@ -11,5 +11,5 @@ setup(
     author_email='mihail.milushev@lanzz.org',
 
     packages=find_packages(),
-    python_requires='>=3.5',
+    python_requires='>=3.7',
 )
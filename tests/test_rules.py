@@ -0,0 +1,66 @@
+import pytest
+
+from abnf import Alt, Ch, Cut, L, NoMatchError, Opt, Rep, Rx, Seq
+
+
+def test_failed_sequence_does_not_leak_optional_capture():
+    rule = Alt(Seq(Opt(L('a')['x']), L('b')), Seq(L('a'), L('c')))
+    assert rule('ac') == {}
+
+
+def test_failed_sequence_does_not_leak_regexp_groups():
+    rule = Alt(Seq(Rx('(?P<x>a)'), L('b')), Seq(L('a'), L('c')))
+    assert rule('ac') == {}
+
+
+def test_failed_optional_sequence_does_not_leak_regexp_groups():
+    rule = Opt(Seq(Rx('(?P<x>a)'), L('b'))) + L('ac')
+    assert rule('ac') == {}
+
+
+def test_pure_sequence_is_atomic():
+    assert Seq(L('a'), L('b'))._atomic
+    assert not Seq(L('a'), Rx('(?P<x>b)'))._atomic
+
+
+def test_chars_with_huge_max_matches():
+    assert Ch('a', max=2 ** 32)['v']('aaa') == {'v': 'aaa'}
+    assert (L('-') + Ch('a', max=2 ** 32) + L('-'))['v']('-aa-') == {'v': '-aa-'}
+
+
+def test_chars_with_huge_min_does_not_match():
+    with pytest.raises(NoMatchError):
+        Ch('a', min=2 ** 40)('aaa')
+
+
+def test_cut_commits_to_alternative():
+    rule = Alt(L('a') + Cut() + L('b'), L('ac'))
+    with pytest.raises(NoMatchError):
+        rule('ac')
+
+
+def test_failure_before_cut_tries_next_alternative():
+    rule = Alt(L('a') + L('b') + Cut() + L('c'), L('ad')['x'])
+    assert rule('ad') == {'x': 'ad'}
+
+
+def test_cut_only_commits_innermost_alternatives():
+    rule = Alt(Alt(L('a') + Cut() + L('b'), L('ac')['inner']), L('ac')['outer'])
+    assert rule('ac') == {'outer': 'ac'}
+    rule = Alt(Alt((L('a') + Cut() + L('b'))['x'], L('ad')), L('ac')['outer'])
+    assert rule('ac') == {'outer': 'ac'}
+    # alternatives extended with | are spliced, the cut commits to all of them
+    with pytest.raises(NoMatchError):
+        ((L('a') + Cut() + L('b') | L('ad')) | L('ac'))('ac')
+
+
+def test_cut_failure_is_swallowed_by_optional_and_repeat():
+    assert (Opt(L('a') + Cut() + L('b')) + L('ac'))('ac') == {}
+    assert (Rep(L('a') + Cut() + L('b'))['x'] + L('ac'))('abac') == {'x': [{}]}
+
+
+def test_cut_in_nested_sequence_does_not_cover_following_rules():
+    assert Alt(Seq(L('a'), Seq(L('b'), Cut()), L('c')), L('abd'))('abd') == {}
+    assert Alt(L('a') + (L('b') + Cut()) + L('c'), L('abd'))('abd') == {}
+    with pytest.raises(NoMatchError):
+        Alt(L('a') + Cut() + L('b') + L('c'), L('abd'))('abd')
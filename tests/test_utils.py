@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from abnf.utils import CharRange
+
+
+def test_comparisons_with_char_ranges():
+    az = CharRange('a', 'z')
+    assert CharRange('a', 'c') < az
+    assert CharRange('a', 'c') <= az
+    assert az > CharRange('a', 'c')
+    assert az >= CharRange('a', 'c')
+    assert az <= CharRange('a', 'z')
+    assert not az < CharRange('a', 'z')
+    assert not az > CharRange('a', 'z')
+    assert not CharRange('a', 'c') >= CharRange('b', 'd')
+
+
+def test_comparisons_cast_str_and_int():
+    az = CharRange('a', 'z')
+    assert not az < 'abc'
+    assert not az <= 'abc'
+    assert az > 'abc'
+    assert az >= 'abc'
+    assert az > ord('a')
+    assert CharRange('a') <= ord('a')
+    assert not az < 'abc0'
+    assert not az > 'abc0'
+
+
+def test_comparisons_with_other_types_raise():
+    with pytest.raises(TypeError):
+        CharRange('a', 'z') < 1.5
+
+
+def test_set_operations_cast_str_and_int():
+    assert str(CharRange('a', 'c') | 'x') == 'abcx'
+    assert str(CharRange('a', 'c') & 'bcd') == 'bc'
+    assert str(CharRange('a', 'c') - ord('b')) == 'ac'
+    assert str(CharRange('a', 'c') ^ 'cd') == 'abd'
+
+
+def test_set_operations_match_sets():
+    rnd = random.Random(0)
+    for _ in range(200):
+        a = set(rnd.sample(range(40), rnd.randrange(10)))
+        b = set(rnd.sample(range(40), rnd.randrange(10)))
+        ra = CharRange(''.join(map(chr, a)))
+        rb = CharRange(''.join(map(chr, b)))
+        assert set(map(ord, ra | rb)) == a | b
+        assert set(map(ord, ra & rb)) == a & b
+        assert set(map(ord, ra - rb)) == a - b
+        assert set(map(ord, ra ^ rb)) == a ^ b
+        assert (ra <= rb) == (a <= b)
+        assert (ra < rb) == (a < b)
+        assert (ra >= rb) == (a >= b)
+        assert (ra > rb) == (a > b)
+        assert len(ra) == len(a)
+        assert list(map(ord, ra)) == sorted(a)
+        assert all((chr(c) in ra) == (c in a) for c in range(40))
+
+
+def test_huge_range_is_cheap():
+    everything = CharRange(0, 0x10ffff)
+    assert len(everything) == 0x110000
+    assert '\U0010ffff' in everything
+    assert len(everything - CharRange('a', 'z')) == 0x110000 - 26
@@ -0,0 +1,85 @@
+import pytest
+
+from abnf import Alt, Ch, Ign, L, LC, Lazy, LazyValue, Map, Memo, NoMatchError, Opt, Rep, Rx, Seq, XF
+from abnf.utils import Context
+
+
+def test_memoize_replays_value_equal_to_first_callers():
+    X = Memo(L('b'))
+    rule = Alt(Seq(L('b'), X, L('c')), Seq(Ign(L('b')), X))['g'] + Ch('x', min=0, max=None)
+    assert rule('bb') == {'g': 'b'}
+
+
+def test_memoize_replays_capture_equal_to_first_callers():
+    X = Memo(L('a')['x'])
+    rule = Alt(Seq(L('a')['x'], X, L('c')), Seq(L('a'), X))
+    assert rule('aa') == {'x': 'a'}
+
+
+def test_lazy_defers_structured_parse_to_first_access():
+    calls = []
+    structured = XF(L('ab'), lambda value: calls.append(value) or value)['t']
+    result = (Lazy(Rx('[^;]*'), structured)['v'] + L(';'))('ab;')
+    assert isinstance(result['v'], LazyValue)
+    assert str(result['v']) == 'ab'
+    assert calls == []
+    assert result['v'].value == {'t': 'ab'}
+    assert result['v'].value is result['v'].value
+    assert calls == ['ab']
+
+
+def test_lazy_structured_failure_raises_on_access():
+    result = (Lazy(Rx('[^;]*'), L('ab'))['v'] + L(';'))('zz;')
+    with pytest.raises(NoMatchError):
+        result['v'].value
+
+
+def test_mapping_builds_context():
+    result = Map(L('k')['key'] + L('v')['value'])['m']('kv')
+    assert isinstance(result['m'], Context)
+    assert result == {'m': {'k': 'v'}}
+
+
+def test_mapping_with_custom_names():
+    rule = Map(Ch('ab')['name'] + L('=') + Ch('xy')['val'], delimiter=',', key_name='name', value_name='val')
+    assert rule['m']('a=x,b=y') == {'m': {'a': 'x', 'b': 'y'}}
+
+
+class Unequal(object):
+    """Default value that can't be compared."""
+
+    def __eq__(self, other):
+        raise TypeError('not comparable')
+
+    __ne__ = __eq__
+    __hash__ = object.__hash__
+
+
+@pytest.mark.parametrize('default', ['none', 0, Unequal()])
+def test_optional_captures_default(default):
+    opt = Opt(L('x'), default=default)
+    rule = opt['v'] + L('y')
+    # the first parse finds out the first characters of the rule by raising
+    assert rule('y')['v'] is default
+    assert opt._first_chars
+    # subsequent parses don't even try the rule
+    assert rule('y')['v'] is default
+    assert rule('xy') == {'v': 'x'}
+
+
+def test_optional_without_default_captures_empty_match():
+    rule = Opt(L('x'))['v'] + L('y')
+    assert rule('y') == {'v': ''}
+    assert rule('y') == {'v': ''}
+
+
+def test_repeat_with_huge_bounds():
+    assert Rep(LC('a'), min=0, max=2 ** 40)('aaa') == {}
+    assert Rep(Ch('a'), max=2 ** 32)['v']('aaa') == {'v': [{}, {}, {}]}
+    with pytest.raises(NoMatchError):
+        Rep(Ch('a'), min=2 ** 40)('aaa')
+
+
+def test_repeat_with_impossible_range():
+    with pytest.raises(NoMatchError):
+        Rep(Ch('a'), min=3, max=2)('aaa')